@@ -4,30 +4,408 @@ Handles all database operations for storing landmarks, historical texts, AI-gene
 """
 
 import sqlite3
-import json
-from datetime import datetime
+import concurrent.futures
+import itertools
+import math
+import queue
+import threading
+from collections import namedtuple
+from functools import partial
 from pathlib import Path
 
+import orjson
+
 DB_PATH = Path(__file__).parent / 'cache.db'
 
+EARTH_RADIUS_KM = 6371.0
+
+# Degrees of latitude per kilometer; degrees of longitude shrink by cos(latitude).
+DEGREES_PER_KM = 1.0 / 111.0
+
+# Number of read queries between automatic planner statistics refreshes.
+OPTIMIZE_EVERY_N_READS = 1000
+
+# Rows ANALYZE samples per index, which keeps a refresh cheap on large tables.
+ANALYSIS_LIMIT_ROWS = 1000
+
+# Stand-in for a NULL year so that answers without a year share one "latest" slot.
+NULL_YEAR_KEY = -2147483648
+
+CONNECTION_PRAGMAS = '''
+    PRAGMA synchronous = NORMAL;
+    PRAGMA temp_store = MEMORY;
+    PRAGMA cache_size = -64000;
+    PRAGMA busy_timeout = 5000;
+    PRAGMA mmap_size = 268435456;
+'''
+
+# Pages written to the WAL before the writer folds it back into the main database file.
+WAL_AUTOCHECKPOINT_PAGES = 1000
+
+# Maximum number of queued write operations applied in one transaction.
+WRITE_BATCH_SIZE = 256
+
+# Size of each connection's prepared statement cache, keyed by SQL text.
+STATEMENT_CACHE_SIZE = 256
+
+# Query statements live at module level so that every call hands the same SQL text
+# to the connection's statement cache and skips re-preparing it.
+# Updating in place keeps each landmark's rowid, which also keys its landmarks_rtree entry.
+_SQL_UPSERT_LANDMARK = '''
+    INSERT INTO landmarks
+    (id, name, lat, lon, osm_type, osm_id, tags, wikidata_id, wikipedia_url, retrieved_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(id) DO UPDATE SET
+        name = excluded.name,
+        lat = excluded.lat,
+        lon = excluded.lon,
+        osm_type = excluded.osm_type,
+        osm_id = excluded.osm_id,
+        tags = excluded.tags,
+        wikidata_id = excluded.wikidata_id,
+        wikipedia_url = excluded.wikipedia_url,
+        retrieved_at = excluded.retrieved_at
+    ON CONFLICT(osm_type, osm_id) DO UPDATE SET
+        id = excluded.id,
+        name = excluded.name,
+        lat = excluded.lat,
+        lon = excluded.lon,
+        tags = excluded.tags,
+        wikidata_id = excluded.wikidata_id,
+        wikipedia_url = excluded.wikipedia_url,
+        retrieved_at = excluded.retrieved_at
+'''
+
+_SQL_UPSERT_LANDMARK_RTREE = '''
+    INSERT OR REPLACE INTO landmarks_rtree (id, min_lat, max_lat, min_lon, max_lon)
+    VALUES ((SELECT rowid FROM landmarks WHERE id = ?), ?, ?, ?, ?)
+'''
+
+_SQL_SELECT_LANDMARK_BY_ID = 'SELECT * FROM landmarks WHERE id = ?'
+
+_SQL_SELECT_LANDMARKS_IN_BOX = '''
+    SELECT landmarks.id, landmarks.name, landmarks.lat, landmarks.lon, landmarks.osm_type, landmarks.osm_id,
+           landmarks.tags, landmarks.wikidata_id, landmarks.wikipedia_url, landmarks.retrieved_at
+    FROM landmarks_rtree
+    JOIN landmarks ON landmarks.rowid = landmarks_rtree.id
+    WHERE landmarks_rtree.min_lat >= ? AND landmarks_rtree.max_lat <= ?
+      AND landmarks_rtree.min_lon >= ? AND landmarks_rtree.max_lon <= ?
+'''
+
+_SQL_INSERT_HISTORICAL_TEXT = '''
+    INSERT INTO historical_texts
+    (landmark_id, text, source, source_url, retrieval_status, error_message)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+_SQL_UPSERT_LATEST_HISTORICAL_TEXT = '''
+    INSERT INTO latest_historical_texts
+    (landmark_id, id, text, source, source_url, retrieval_status, error_message, retrieved_at)
+    SELECT landmark_id, id, text, source, source_url, retrieval_status, error_message, retrieved_at
+    FROM historical_texts WHERE id = ?
+    ON CONFLICT(landmark_id) DO UPDATE SET
+        id = excluded.id,
+        text = excluded.text,
+        source = excluded.source,
+        source_url = excluded.source_url,
+        retrieval_status = excluded.retrieval_status,
+        error_message = excluded.error_message,
+        retrieved_at = excluded.retrieved_at
+'''
+
+_SQL_SELECT_LATEST_HISTORICAL_TEXT = '''
+    SELECT id, landmark_id, text, source, source_url, retrieval_status, error_message, retrieved_at
+    FROM latest_historical_texts
+    WHERE landmark_id = ?
+'''
+
+_SQL_INSERT_GENERATED_ANSWER = '''
+    INSERT INTO generated_answers
+    (landmark_id, question, year, answer, generation_status, error_message, model_used, temperature)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_SQL_UPSERT_LATEST_GENERATED_ANSWER = f'''
+    INSERT INTO latest_generated_answers
+    (landmark_id, question, year, id, answer, generation_status, error_message, model_used, temperature, generated_at)
+    SELECT landmark_id, question, year, id, answer, generation_status, error_message, model_used, temperature, generated_at
+    FROM generated_answers WHERE id = ?
+    ON CONFLICT(landmark_id, question, IFNULL(year, {NULL_YEAR_KEY})) DO UPDATE SET
+        id = excluded.id,
+        answer = excluded.answer,
+        generation_status = excluded.generation_status,
+        error_message = excluded.error_message,
+        model_used = excluded.model_used,
+        temperature = excluded.temperature,
+        generated_at = excluded.generated_at
+'''
+
+# year IS ? compares against the real column, so its INTEGER affinity still matches years bound as
+# text and NULL matches NULL; the (landmark_id, question) index prefix narrows the scan.
+_SQL_SELECT_LATEST_GENERATED_ANSWER = '''
+    SELECT id, landmark_id, question, year, answer, generation_status, error_message, model_used, temperature, generated_at
+    FROM latest_generated_answers
+    WHERE landmark_id = ? AND question = ? AND year IS ?
+'''
+
+_SQL_INSERT_EVALUATION_METRIC = '''
+    INSERT INTO evaluation_metrics (test_name, metric_name, metric_value)
+    VALUES (?, ?, ?)
+'''
+
+_SQL_SELECT_EVALUATION_METRICS_BY_TEST = 'SELECT * FROM evaluation_metrics WHERE test_name = ?'
+
+_SQL_SELECT_EVALUATION_METRICS = 'SELECT * FROM evaluation_metrics'
+
+_SQL_UPSERT_STATISTIC = '''
+    INSERT INTO statistics (key, value)
+    VALUES (?, ?)
+    ON CONFLICT(key) DO UPDATE SET
+        value = excluded.value,
+        updated_at = CURRENT_TIMESTAMP
+'''
+
+_SQL_SELECT_STATISTIC = 'SELECT value FROM statistics WHERE key = ?'
+
+_SQL_UPSERT_CACHED_ANSWER = '''
+    INSERT INTO cached_answers (prompt_hash, landmark_id, question, answer, model_used)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(prompt_hash) DO UPDATE SET
+        answer = excluded.answer,
+        model_used = excluded.model_used,
+        created_at = CURRENT_TIMESTAMP
+'''
+
+_SQL_SELECT_CACHED_ANSWER = 'SELECT * FROM cached_answers WHERE prompt_hash = ?'
+
+# Unqualified DELETEs on tables without triggers or enforced foreign keys let SQLite
+# drop each table's pages wholesale instead of deleting row by row.
+_SQL_CLEAR_ALL_TABLES = (
+    'DELETE FROM evaluation_metrics',
+    'DELETE FROM cached_answers',
+    'DELETE FROM latest_generated_answers',
+    'DELETE FROM generated_answers',
+    'DELETE FROM latest_historical_texts',
+    'DELETE FROM historical_texts',
+    'DELETE FROM landmarks',
+    'DELETE FROM landmarks_rtree',
+)
+
+
+def haversine_distance_km(latitude_a, longitude_a, latitude_b, longitude_b):
+    """Return the great-circle distance in kilometers between two coordinates."""
+    phi_a = math.radians(latitude_a)
+    phi_b = math.radians(latitude_b)
+    delta_phi = phi_b - phi_a
+    delta_lambda = math.radians(longitude_b - longitude_a)
+    a = math.sin(delta_phi / 2) ** 2 + math.cos(phi_a) * math.cos(phi_b) * math.sin(delta_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def longitude_search_ranges(latitude, longitude, radius_in_kilometers):
+    """Return the (min_lon, max_lon) ranges covering a search circle, split at the antimeridian."""
+    latitude_delta = radius_in_kilometers * DEGREES_PER_KM
+    # Meridians converge toward the poles, so size the span for the box's most polar latitude.
+    polar_latitude = abs(latitude) + latitude_delta
+    meridian_scale = math.cos(math.radians(polar_latitude)) if polar_latitude < 90.0 else 0.0
+    if meridian_scale <= latitude_delta / 180.0:
+        # The circle reaches a pole or spans every meridian, so search the whole longitude range.
+        return [(-180.0, 180.0)]
+
+    longitude_delta = latitude_delta / meridian_scale
+    min_longitude = longitude - longitude_delta
+    max_longitude = longitude + longitude_delta
+    if min_longitude < -180.0:
+        return [(min_longitude + 360.0, 180.0), (-180.0, max_longitude)]
+    if max_longitude > 180.0:
+        return [(min_longitude, 180.0), (-180.0, max_longitude - 360.0)]
+    return [(min_longitude, max_longitude)]
+
+
+class _DatabaseWriter(threading.Thread):
+    """Background thread that owns the only write connection and applies queued write operations.
+
+    A write operation is a callable taking the write connection. Bursts of up to WRITE_BATCH_SIZE
+    queued operations share one BEGIN IMMEDIATE transaction, each inside its own savepoint so that
+    a failing operation only rolls back its own changes.
+    """
+
+    def __init__(self, open_connection):
+        """Create the writer; open_connection is called on the writer thread to get its connection."""
+        super().__init__(name='database-writer', daemon=True)
+        self._open_connection = open_connection
+        self._write_queue = queue.Queue()
+
+    def submit(self, write_operation):
+        """Queue a write operation and return a Future that resolves to its return value."""
+        write_future = concurrent.futures.Future()
+        self._write_queue.put((write_operation, write_future))
+        return write_future
+
+    def stop(self):
+        """Apply every write queued so far, then close the write connection and end the thread."""
+        self._write_queue.put(None)
+        self.join()
+
+    def run(self):
+        """Apply queued write operations in batches until stop() is called."""
+        try:
+            database_connection = self._open_connection()
+        except sqlite3.Error as error:
+            self._fail_queued_writes(error)
+            return
+
+        try:
+            queued_item = ()
+            while queued_item is not None:
+                write_batch = []
+                queued_item = self._write_queue.get()
+                while queued_item is not None:
+                    write_batch.append(queued_item)
+                    if len(write_batch) >= WRITE_BATCH_SIZE:
+                        break
+                    try:
+                        queued_item = self._write_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if write_batch:
+                    self._apply_write_batch(database_connection, write_batch)
+        finally:
+            database_connection.close()
+
+    def _fail_queued_writes(self, error):
+        """Fail every queued write with the error that prevented opening the write connection."""
+        queued_item = self._write_queue.get()
+        while queued_item is not None:
+            queued_item[1].set_exception(error)
+            queued_item = self._write_queue.get()
+
+    @staticmethod
+    def _apply_write_batch(database_connection, write_batch):
+        """Run a batch of write operations in one transaction and resolve their Futures."""
+        write_outcomes = []
+        try:
+            database_connection.execute('BEGIN IMMEDIATE')
+            for write_operation, write_future in write_batch:
+                database_connection.execute('SAVEPOINT write_operation')
+                try:
+                    write_outcomes.append((write_future, write_operation(database_connection), None))
+                except Exception as error:
+                    database_connection.execute('ROLLBACK TO write_operation')
+                    write_outcomes.append((write_future, None, error))
+                database_connection.execute('RELEASE write_operation')
+            database_connection.execute('COMMIT')
+        except Exception as error:
+            if database_connection.in_transaction:
+                database_connection.execute('ROLLBACK')
+            for _, write_future in write_batch:
+                write_future.set_exception(error)
+            return
+
+        for write_future, write_result, write_error in write_outcomes:
+            if write_error is None:
+                write_future.set_result(write_result)
+            else:
+                write_future.set_exception(write_error)
+
+
+def _refresh_planner_statistics(database_connection):
+    """Write operation that refreshes the query planner statistics for every table."""
+    # PRAGMA optimize on SQLite 3.40 only considers tables this connection has queried, and never
+    # tables without existing statistics; reads happen on other connections, so run a bounded ANALYZE.
+    database_connection.execute(f'PRAGMA analysis_limit = {ANALYSIS_LIMIT_ROWS}')
+    database_connection.execute('ANALYZE')
+
+
+def _report_write_error(error_context, write_future):
+    """Print the error of a write nobody waited for, if it failed."""
+    write_error = write_future.exception()
+    if write_error is not None:
+        print(f"{error_context}: {write_error}")
+
 
 class Database:
-    """A wrapper class for database operations that manages the SQLite connection and queries."""
+    """A wrapper class for database operations that manages the SQLite connection and queries.
+
+    All writes go through a single background writer thread. The save_* methods wait for their
+    write by default; with wait=False they return a concurrent.futures.Future instead, which
+    async callers can await through asyncio.wrap_future. Reads use one read-only connection per
+    thread.
+    """
 
     def __init__(self, path=None):
         """Initialize the database with an optional custom path."""
         self.path = path or str(DB_PATH)
+        self._thread_local = threading.local()
+        self._read_query_counter = itertools.count(1)
+        self._database_writer = _DatabaseWriter(partial(self._open_database_connection, read_only=False))
+        self._database_writer.start()
         self.initialize_database_tables()
+        self._landmark_record = self._build_landmark_record_type()
 
     def get_database_connection(self):
-        """Create and return a new database connection."""
-        database_connection = sqlite3.connect(self.path)
+        """Return the calling thread's read-only database connection, opening it on first use."""
+        database_connection = getattr(self._thread_local, 'connection', None)
+        if database_connection is None:
+            database_connection = self._open_database_connection(read_only=True)
+            self._thread_local.connection = database_connection
+        return database_connection
+
+    def _database_uri(self, read_only):
+        """Build the SQLite URI for a reader or writer connection."""
+        if self.path == ':memory:':
+            # A named shared-cache database lets the writer and the readers see the same data.
+            return f'file:history-{id(self)}?mode=memory&cache=shared'
+        connection_mode = 'ro' if read_only else 'rwc'
+        return f'{Path(self.path).resolve().as_uri()}?mode={connection_mode}'
+
+    def _open_database_connection(self, read_only):
+        """Create a new database connection with the tuned PRAGMAs applied."""
+        database_connection = sqlite3.connect(
+            self._database_uri(read_only),
+            uri=True,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
         database_connection.row_factory = sqlite3.Row
+        if self.path == ':memory:':
+            # Shared-cache readers would otherwise hit table locks while the writer is mid-batch.
+            database_connection.execute('PRAGMA read_uncommitted = 1')
+        elif not read_only:
+            # Journal mode is persisted in the database file, so the writer sets it for every reader.
+            database_connection.execute('PRAGMA journal_mode = WAL')
+            database_connection.execute(f'PRAGMA wal_autocheckpoint = {WAL_AUTOCHECKPOINT_PAGES}')
+        database_connection.executescript(CONNECTION_PRAGMAS)
         return database_connection
 
+    def _submit_write(self, write_operation, error_context, wait):
+        """Queue a write; wait for it and report errors, or return its Future when wait is False."""
+        write_future = self._database_writer.submit(write_operation)
+        if not wait:
+            write_future.add_done_callback(partial(_report_write_error, error_context))
+            return write_future
+        try:
+            return write_future.result()
+        except sqlite3.Error as error:
+            print(f"{error_context}: {error}")
+            return False
+
+    def _build_landmark_record_type(self):
+        """Build a namedtuple type whose fields mirror the landmarks table columns."""
+        table_columns = self.get_database_connection().execute('PRAGMA table_info(landmarks)').fetchall()
+        return namedtuple('Landmark', [table_column['name'] for table_column in table_columns])
+
+    def _landmark_row_factory(self, database_cursor, row):
+        """Row factory that builds landmark records positionally instead of mapping rows."""
+        return self._landmark_record._make(row)
+
     def initialize_database_tables(self):
         """Create all required database tables if they don't already exist."""
-        database_connection = self.get_database_connection()
+        self._database_writer.submit(self._create_database_tables).result()
+
+    @staticmethod
+    def _create_database_tables(database_connection):
+        """Write operation that creates the schema and refreshes planner statistics."""
         database_cursor = database_connection.cursor()
 
         database_cursor.execute('''
@@ -41,7 +419,7 @@ class Database:
                 tags JSON,
                 wikidata_id TEXT,
                 wikipedia_url TEXT,
-                retrieved_at TIMESTAMP,
+                retrieved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 UNIQUE(osm_type, osm_id)
             )
         ''')
@@ -95,76 +473,188 @@ class Database:
             )
         ''')
 
-        database_connection.commit()
-        database_connection.close()
+        database_cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cached_answers (
+                prompt_hash TEXT PRIMARY KEY,
+                landmark_id TEXT,
+                question TEXT,
+                answer TEXT,
+                model_used TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
 
-    def save_landmark_to_database(self, landmark_data):
-        """Save or update a landmark in the database."""
-        database_connection = self.get_database_connection()
-        database_cursor = database_connection.cursor()
-        try:
+        database_cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'landmarks_rtree'")
+        if database_cursor.fetchone() is None:
+            # Spatial index over landmark points, keyed by the landmarks rowid.
             database_cursor.execute('''
-                INSERT OR REPLACE INTO landmarks
-                (id, name, lat, lon, osm_type, osm_id, tags, wikidata_id, wikipedia_url, retrieved_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                landmark_data['id'],
-                landmark_data['name'],
-                landmark_data['lat'],
-                landmark_data['lon'],
-                landmark_data.get('osmType'),
-                landmark_data.get('osmId'),
-                json.dumps(landmark_data.get('tags', {})),
-                landmark_data.get('wikidata'),
-                landmark_data.get('wikipedia'),
-                datetime.utcnow().isoformat(),
-            ))
-            database_connection.commit()
+                CREATE VIRTUAL TABLE landmarks_rtree USING rtree(
+                    id,
+                    min_lat, max_lat,
+                    min_lon, max_lon
+                )
+            ''')
+            database_cursor.execute('''
+                INSERT INTO landmarks_rtree (id, min_lat, max_lat, min_lon, max_lon)
+                SELECT rowid, lat, lat, lon, lon FROM landmarks
+            ''')
+
+        database_cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'latest_historical_texts'")
+        if database_cursor.fetchone() is None:
+            # Newest historical text per landmark, kept in step with the historical_texts log.
+            database_cursor.execute('''
+                CREATE TABLE latest_historical_texts (
+                    landmark_id TEXT PRIMARY KEY,
+                    id INTEGER,
+                    text TEXT,
+                    source TEXT,
+                    source_url TEXT,
+                    retrieval_status TEXT,
+                    error_message TEXT,
+                    retrieved_at TIMESTAMP
+                )
+            ''')
+            database_cursor.execute('''
+                INSERT INTO latest_historical_texts
+                (landmark_id, id, text, source, source_url, retrieval_status, error_message, retrieved_at)
+                SELECT landmark_id, id, text, source, source_url, retrieval_status, error_message, retrieved_at
+                FROM historical_texts
+                WHERE id IN (SELECT MAX(id) FROM historical_texts GROUP BY landmark_id)
+            ''')
+
+        database_cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'latest_generated_answers'")
+        if database_cursor.fetchone() is None:
+            # Newest answer per (landmark, question, year), kept in step with the generated_answers log.
+            database_cursor.execute('''
+                CREATE TABLE latest_generated_answers (
+                    landmark_id TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    year INTEGER,
+                    id INTEGER,
+                    answer TEXT,
+                    generation_status TEXT,
+                    error_message TEXT,
+                    model_used TEXT,
+                    temperature REAL,
+                    generated_at TIMESTAMP
+                )
+            ''')
+            database_cursor.execute(f'''
+                CREATE UNIQUE INDEX idx_latest_ans_key
+                ON latest_generated_answers(landmark_id, question, IFNULL(year, {NULL_YEAR_KEY}))
+            ''')
+            database_cursor.execute('''
+                INSERT INTO latest_generated_answers
+                (landmark_id, question, year, id, answer, generation_status, error_message, model_used, temperature, generated_at)
+                SELECT landmark_id, question, year, id, answer, generation_status, error_message, model_used, temperature, generated_at
+                FROM generated_answers
+                WHERE id IN (SELECT MAX(id) FROM generated_answers GROUP BY landmark_id, question, year)
+            ''')
+
+        # Latest-row lookups are served by the latest_* tables, so these log indexes only slowed appends.
+        database_cursor.execute('DROP INDEX IF EXISTS idx_hist_lm_time')
+        database_cursor.execute('DROP INDEX IF EXISTS idx_ans_lookup')
+
+        database_cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_eval_test
+            ON evaluation_metrics(test_name)
+        ''')
+
+        _refresh_planner_statistics(database_connection)
+
+    def optimize(self):
+        """Refresh the query planner statistics; bulk loaders should call this after large imports."""
+        self._database_writer.submit(_refresh_planner_statistics).result()
+
+    def _record_read_query(self):
+        """Count a read query and queue a statistics refresh every OPTIMIZE_EVERY_N_READS reads."""
+        # itertools.count advances atomically, so concurrent request threads never lose a count.
+        if next(self._read_query_counter) % OPTIMIZE_EVERY_N_READS == 0:
+            self._database_writer.submit(_refresh_planner_statistics)
+
+    @staticmethod
+    def _landmark_row(landmark_data):
+        """Build the landmarks table parameter tuple for a single landmark."""
+        return (
+            landmark_data['id'],
+            landmark_data['name'],
+            landmark_data['lat'],
+            landmark_data['lon'],
+            landmark_data.get('osmType'),
+            landmark_data.get('osmId'),
+            # Compact UTF-8 JSON text, so the column stays readable by SQLite's JSON functions.
+            orjson.dumps(landmark_data.get('tags', {})).decode(),
+            landmark_data.get('wikidata'),
+            landmark_data.get('wikipedia'),
+        )
+
+    @staticmethod
+    def _landmark_rtree_row(landmark_data):
+        """Build the landmarks_rtree parameter tuple for a single landmark point."""
+        latitude = landmark_data['lat']
+        longitude = landmark_data['lon']
+        return (landmark_data['id'], latitude, latitude, longitude, longitude)
+
+    def save_landmark_to_database(self, landmark_data, wait=True):
+        """Save or update a landmark in the database."""
+        landmark_row = self._landmark_row(landmark_data)
+        landmark_rtree_row = self._landmark_rtree_row(landmark_data)
+
+        def write_landmark(database_connection):
+            database_connection.execute(_SQL_UPSERT_LANDMARK, landmark_row)
+            database_connection.execute(_SQL_UPSERT_LANDMARK_RTREE, landmark_rtree_row)
             return True
-        except Exception as error:
-            print(f"Error saving landmark to database: {error}")
-            return False
-        finally:
-            database_connection.close()
+
+        return self._submit_write(write_landmark, "Error saving landmark to database", wait)
+
+    def save_landmarks_to_database_bulk(self, landmarks_data, wait=True):
+        """Save or update many landmarks in a single transaction."""
+        landmark_rows = [self._landmark_row(landmark_data) for landmark_data in landmarks_data]
+        landmark_rtree_rows = [self._landmark_rtree_row(landmark_data) for landmark_data in landmarks_data]
+
+        def write_landmarks(database_connection):
+            database_connection.executemany(_SQL_UPSERT_LANDMARK, landmark_rows)
+            database_connection.executemany(_SQL_UPSERT_LANDMARK_RTREE, landmark_rtree_rows)
+            return True
+
+        return self._submit_write(write_landmarks, "Error saving landmarks to database", wait)
 
     def retrieve_landmark_by_id(self, landmark_id):
-        """Retrieve a landmark by its ID."""
+        """Retrieve a landmark by its ID as a Landmark namedtuple; use _asdict() for a dict."""
         database_connection = self.get_database_connection()
         database_cursor = database_connection.cursor()
-        try:
-            database_cursor.execute('SELECT * FROM landmarks WHERE id = ?', (landmark_id,))
-            retrieved_row = database_cursor.fetchone()
-            return dict(retrieved_row) if retrieved_row else None
-        finally:
-            database_connection.close()
+        database_cursor.row_factory = self._landmark_row_factory
+        self._record_read_query()
+        database_cursor.execute(_SQL_SELECT_LANDMARK_BY_ID, (landmark_id,))
+        return database_cursor.fetchone()
 
     def retrieve_landmarks_by_geographic_area(self, latitude, longitude, radius_in_kilometers=1):
-        """Retrieve all landmarks within a certain radius of a location."""
+        """Retrieve all landmarks within a certain radius of a location as Landmark namedtuples."""
         database_connection = self.get_database_connection()
         database_cursor = database_connection.cursor()
-        try:
-            database_cursor.execute('''
-                SELECT * FROM landmarks
-                WHERE ABS(lat - ?) < ? AND ABS(lon - ?) < ?
-            ''', (latitude, radius_in_kilometers / 111, longitude, radius_in_kilometers / 111))
-            
-            landmarks_list = []
+        database_cursor.row_factory = self._landmark_row_factory
+        self._record_read_query()
+        latitude_delta = radius_in_kilometers * DEGREES_PER_KM
+
+        landmarks_list = []
+        # A circle crossing the antimeridian is searched as two rectangles, one on each side.
+        for min_longitude, max_longitude in longitude_search_ranges(latitude, longitude, radius_in_kilometers):
+            database_cursor.execute(_SQL_SELECT_LANDMARKS_IN_BOX, (
+                latitude - latitude_delta,
+                latitude + latitude_delta,
+                min_longitude,
+                max_longitude,
+            ))
             for retrieved_row in database_cursor.fetchall():
-                landmarks_list.append(dict(retrieved_row))
-            return landmarks_list
-        finally:
-            database_connection.close()
+                # The rectangles are in degrees, so trim their corners back to the requested radius.
+                if haversine_distance_km(latitude, longitude, retrieved_row.lat, retrieved_row.lon) <= radius_in_kilometers:
+                    landmarks_list.append(retrieved_row)
+        return landmarks_list
 
-    def save_historical_text_for_landmark(self, landmark_id, text_content=None, source_provider=None, source_url=None, retrieval_status='success', error_message=None):
+    def save_historical_text_for_landmark(self, landmark_id, text_content=None, source_provider=None, source_url=None, retrieval_status='success', error_message=None, wait=True):
         """Save historical text retrieved for a landmark."""
-        database_connection = self.get_database_connection()
-        database_cursor = database_connection.cursor()
-        try:
-            database_cursor.execute('''
-                INSERT INTO historical_texts
-                (landmark_id, text, source, source_url, retrieval_status, error_message)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
+        def write_historical_text(database_connection):
+            database_cursor = database_connection.execute(_SQL_INSERT_HISTORICAL_TEXT, (
                 landmark_id,
                 text_content,
                 source_provider,
@@ -172,123 +662,112 @@ class Database:
                 retrieval_status,
                 error_message,
             ))
-            database_connection.commit()
+            database_connection.execute(_SQL_UPSERT_LATEST_HISTORICAL_TEXT, (database_cursor.lastrowid,))
             return True
-        except Exception as error:
-            print(f"Error saving historical text: {error}")
-            return False
-        finally:
-            database_connection.close()
+
+        return self._submit_write(write_historical_text, "Error saving historical text", wait)
 
     def get_latest_historical_text_for_landmark(self, landmark_id):
         """Get the most recently retrieved historical text for a landmark."""
         database_connection = self.get_database_connection()
         database_cursor = database_connection.cursor()
-        try:
-            database_cursor.execute('''
-                SELECT * FROM historical_texts
-                WHERE landmark_id = ?
-                ORDER BY retrieved_at DESC LIMIT 1
-            ''', (landmark_id,))
-            retrieved_row = database_cursor.fetchone()
-            return dict(retrieved_row) if retrieved_row else None
-        finally:
-            database_connection.close()
+        self._record_read_query()
+        database_cursor.execute(_SQL_SELECT_LATEST_HISTORICAL_TEXT, (landmark_id,))
+        retrieved_row = database_cursor.fetchone()
+        return dict(retrieved_row) if retrieved_row else None
 
-    def save_generated_answer_for_landmark(self, landmark_id, user_question, generated_answer=None, year_filter=None, generation_status='success', error_message=None, model_name='ollama-llama2', temperature_value=0.3):
+    def save_generated_answer_for_landmark(self, landmark_id, user_question, generated_answer=None, year_filter=None, generation_status='success', error_message=None, model_name=None, temperature_value=0.3, wait=True):
         """Save an AI-generated answer about a landmark."""
-        database_connection = self.get_database_connection()
-        database_cursor = database_connection.cursor()
-        try:
-            database_cursor.execute('''
-                INSERT INTO generated_answers
-                (landmark_id, question, year, answer, generation_status, error_message, model_used, temperature)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (landmark_id, user_question, year_filter, generated_answer, generation_status, error_message, model_name, temperature_value))
-            database_connection.commit()
+        def write_generated_answer(database_connection):
+            database_cursor = database_connection.execute(_SQL_INSERT_GENERATED_ANSWER, (landmark_id, user_question, year_filter, generated_answer, generation_status, error_message, model_name, temperature_value))
+            database_connection.execute(_SQL_UPSERT_LATEST_GENERATED_ANSWER, (database_cursor.lastrowid,))
             return True
-        except Exception as error:
-            print(f"Error saving generated answer: {error}")
-            return False
-        finally:
-            database_connection.close()
+
+        return self._submit_write(write_generated_answer, "Error saving generated answer", wait)
 
     def retrieve_answer_for_landmark(self, landmark_id, user_question, year_filter=None):
         """Retrieve the most recent answer for a specific question about a landmark."""
         database_connection = self.get_database_connection()
         database_cursor = database_connection.cursor()
-        try:
-            database_cursor.execute('''
-                SELECT * FROM generated_answers
-                WHERE landmark_id = ? AND question = ? AND year IS ?
-                ORDER BY generated_at DESC LIMIT 1
-            ''', (landmark_id, user_question, year_filter))
-            retrieved_row = database_cursor.fetchone()
-            return dict(retrieved_row) if retrieved_row else None
-        finally:
-            database_connection.close()
+        self._record_read_query()
+        database_cursor.execute(_SQL_SELECT_LATEST_GENERATED_ANSWER, (landmark_id, user_question, year_filter))
+        retrieved_row = database_cursor.fetchone()
+        return dict(retrieved_row) if retrieved_row else None
+
+    def save_cached_answer(self, prompt_hash, landmark_id, user_question, generated_answer, model_name=None, wait=True):
+        """Cache a successful answer under the hash of the prompt that produced it."""
+        def write_cached_answer(database_connection):
+            database_connection.execute(_SQL_UPSERT_CACHED_ANSWER, (prompt_hash, landmark_id, user_question, generated_answer, model_name))
+            return True
+
+        return self._submit_write(write_cached_answer, "Error saving cached answer", wait)
+
+    def retrieve_cached_answer(self, prompt_hash):
+        """Retrieve the cached answer for a prompt hash, if any."""
+        database_connection = self.get_database_connection()
+        database_cursor = database_connection.cursor()
+        self._record_read_query()
+        database_cursor.execute(_SQL_SELECT_CACHED_ANSWER, (prompt_hash,))
+        retrieved_row = database_cursor.fetchone()
+        return dict(retrieved_row) if retrieved_row else None
 
     def save_evaluation_results(self, test_name, results_data):
         """Save evaluation test results to the database."""
+        metric_rows = [(test_name, metric_key, metric_value) for metric_key, metric_value in results_data.items()]
+
+        def write_metrics(database_connection):
+            database_connection.executemany(_SQL_INSERT_EVALUATION_METRIC, metric_rows)
+
+        self._database_writer.submit(write_metrics).result()
+
+    def iter_evaluation_results(self, test_name=None):
+        """Yield evaluation test results one sqlite3.Row at a time, optionally filtered by test name."""
         database_connection = self.get_database_connection()
-        database_cursor = database_connection.cursor()
+        self._record_read_query()
+        if test_name:
+            database_cursor = database_connection.execute(_SQL_SELECT_EVALUATION_METRICS_BY_TEST, (test_name,))
+        else:
+            database_cursor = database_connection.execute(_SQL_SELECT_EVALUATION_METRICS)
         try:
-            for metric_key, metric_value in results_data.items():
-                database_cursor.execute('''
-                    INSERT INTO evaluation_metrics (test_name, metric_name, metric_value)
-                    VALUES (?, ?, ?)
-                ''', (test_name, metric_key, metric_value))
-            database_connection.commit()
+            for retrieved_row in database_cursor:
+                yield retrieved_row
         finally:
-            database_connection.close()
+            database_cursor.close()
 
     def retrieve_evaluation_results(self, test_name=None):
-        """Retrieve evaluation test results, optionally filtered by test name."""
-        database_connection = self.get_database_connection()
-        database_cursor = database_connection.cursor()
-        try:
-            if test_name:
-                database_cursor.execute('SELECT * FROM evaluation_metrics WHERE test_name = ?', (test_name,))
-            else:
-                database_cursor.execute('SELECT * FROM evaluation_metrics')
-            retrieved_rows = database_cursor.fetchall()
-            return [dict(row) for row in retrieved_rows] if retrieved_rows else []
-        finally:
-            database_connection.close()
+        """Retrieve evaluation test results as sqlite3.Row objects, optionally filtered by test name."""
+        return list(self.iter_evaluation_results(test_name))
 
     def update_statistic_value(self, statistic_key, statistic_value):
         """Save or update a statistic value."""
-        database_connection = self.get_database_connection()
-        database_cursor = database_connection.cursor()
-        try:
-            database_cursor.execute('''
-                INSERT OR REPLACE INTO statistics (key, value)
-                VALUES (?, ?)
-            ''', (statistic_key, str(statistic_value)))
-            database_connection.commit()
-        finally:
-            database_connection.close()
+        def write_statistic(database_connection):
+            database_connection.execute(_SQL_UPSERT_STATISTIC, (statistic_key, str(statistic_value)))
+
+        self._database_writer.submit(write_statistic).result()
 
     def retrieve_statistic_value(self, statistic_key):
         """Retrieve a statistic value by its key."""
         database_connection = self.get_database_connection()
         database_cursor = database_connection.cursor()
-        try:
-            database_cursor.execute('SELECT value FROM statistics WHERE key = ?', (statistic_key,))
-            retrieved_row = database_cursor.fetchone()
-            return retrieved_row['value'] if retrieved_row else None
-        finally:
-            database_connection.close()
+        self._record_read_query()
+        database_cursor.execute(_SQL_SELECT_STATISTIC, (statistic_key,))
+        retrieved_row = database_cursor.fetchone()
+        return retrieved_row['value'] if retrieved_row else None
 
     def clear_all_database_content(self):
         """Delete all data from the database tables (used for testing/reset)."""
-        database_connection = self.get_database_connection()
-        database_cursor = database_connection.cursor()
-        try:
-            database_cursor.execute('DELETE FROM evaluation_metrics')
-            database_cursor.execute('DELETE FROM generated_answers')
-            database_cursor.execute('DELETE FROM historical_texts')
-            database_cursor.execute('DELETE FROM landmarks')
-            database_connection.commit()
-        finally:
+        def write_clear_all(database_connection):
+            for clear_statement in _SQL_CLEAR_ALL_TABLES:
+                database_connection.execute(clear_statement)
+
+        self._database_writer.submit(write_clear_all).result()
+
+    def close(self):
+        """Apply queued writes and stop the writer thread, then close the calling thread's reader."""
+        if self._database_writer.is_alive():
+            self._database_writer.submit(_refresh_planner_statistics)
+            self._database_writer.stop()
+        database_connection = getattr(self._thread_local, 'connection', None)
+        if database_connection is not None:
             database_connection.close()
+            self._thread_local.connection = None
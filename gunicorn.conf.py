@@ -0,0 +1,17 @@
+"""
+Gunicorn configuration for the Interactive History Platform backend.
+Run with: gunicorn server:app
+
+Threaded workers keep quick endpoints (health, statistics) responsive while
+long Ollama generations are in flight. Launch Ollama alongside with
+OLLAMA_NUM_PARALLEL=4 and OLLAMA_MAX_LOADED_MODELS=1 so it can serve several
+of those generations at once without loading extra copies of the model.
+"""
+
+bind = '0.0.0.0:5000'
+workers = 2
+worker_class = 'gthread'
+threads = 16
+# Must exceed the 60 second Ollama request timeout.
+timeout = 120
+keepalive = 5
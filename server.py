@@ -3,50 +3,242 @@ Backend Flask API server for the Interactive History Platform.
 Handles text retrieval from Wikipedia/Wikidata and answer generation using a local LLM.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import os
 import re
+import orjson
+import atexit
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+from urllib.parse import parse_qs, unquote, urlsplit
+from concurrent.futures import Future, ThreadPoolExecutor
+from cachetools import LRUCache, TTLCache
 from db import Database
 
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson for faster response serialization."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 db = Database()
+# Flush queued background writes before the process exits.
+atexit.register(db.close)
 
 OLLAMA_API = 'http://localhost:11434/api/generate'
-OLLAMA_MODEL = 'llama2'
+# A 4-bit quantized model keeps decode fast; pull it first with `ollama pull <model>`.
+OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3.2:3b-instruct-q4_K_M')
+OLLAMA_MODEL_NAME = f'ollama-{OLLAMA_MODEL}'
 WIKI_API = 'https://en.wikipedia.org/w/api.php'
 WIKIDATA_API = 'https://www.wikidata.org/w/api.php'
 
+# TextExtracts rejects exchars values above this limit, so longer extracts are trimmed locally.
+WIKI_EXCHARS_LIMIT = 1200
+
+# OSM wikipedia tags look like "en:Eiffel Tower"; a prefix matching this is a language code, not a namespace.
+WIKI_LANGUAGE_PREFIX_PATTERN = re.compile(r'[a-z]{2,3}(-[a-z]+)*')
+
+# wbgetentities accepts at most this many ids per call.
+WIKIDATA_BATCH_SIZE = 50
+
+# RAG prompts (2000 characters of context plus the question) fit well within 2048 tokens.
+# This stays fixed rather than sized per prompt, because a different num_ctx forces Ollama to reload the model.
+OLLAMA_NUM_CTX = 2048
+# Answers are meant to be brief, so generation is capped.
+OLLAMA_NUM_PREDICT = 256
+
+# How long Ollama keeps the model resident after a request, so answers don't pay a cold model load.
+OLLAMA_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '1h')
+
+RAG_SYSTEM_INSTRUCTIONS = "You are a historical expert. Answer ONLY from the provided context. Don't make stuff up. Keep it brief."
+
+# Every prompt starts with this exact text and the per-question fields come last, so Ollama can
+# reuse the cached prefix across requests and across follow-up questions about one landmark.
+RAG_PROMPT_PREFIX = f"""System Instructions:
+{RAG_SYSTEM_INSTRUCTIONS}
+
+"""
+
+LANDMARK_SLUG_TRANSLATION = str.maketrans({' ': '-'})
+
+
+@lru_cache(maxsize=4096)
+def landmark_slug(landmark_name):
+    """Build the database id used for a landmark name."""
+    return 'lm-' + landmark_name.lower().translate(LANDMARK_SLUG_TRANSLATION)
+
+
+def answer_cache_key(prompt):
+    """Hash a prompt together with the model name, ignoring differences in case and whitespace."""
+    normalized_prompt = ' '.join(prompt.casefold().split())
+    return hashlib.sha256(f'{OLLAMA_MODEL}\n{normalized_prompt}'.encode('utf-8')).hexdigest()
+
+
+# Pooled keep-alive session shared by every outbound Wikipedia, Wikidata and Ollama call.
+http_session = requests.Session()
+http_session.mount('https://', HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=64,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504]),
+))
+http_session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=64))
+
+# Worker pool used to overlap the Wikipedia and Wikidata lookups of a single request.
+text_fetch_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='text-fetch')
+
+# Wikipedia and Wikidata content changes slowly, so successful lookups are reused for an hour.
+# Entries outlive their TTL so they can be revalidated with a conditional GET instead of refetched.
+TEXT_CACHE_TTL_SECONDS = 3600
+wikipedia_text_cache = LRUCache(maxsize=4096)
+wikidata_text_cache = LRUCache(maxsize=4096)
+text_cache_lock = threading.RLock()
+CachedText = namedtuple('CachedText', ['result', 'etag', 'last_modified', 'fetched_at'])
+NOT_MODIFIED = object()
+
+# Platform counts are only informational, so they are recomputed at most every 30 seconds.
+STATISTICS_CACHE_TTL_SECONDS = 30
+statistics_cache = TTLCache(maxsize=1, ttl=STATISTICS_CACHE_TTL_SECONDS)
+statistics_cache_lock = threading.Lock()
+
+# Outbound calls currently running, keyed by what they fetch, so identical concurrent calls run once.
+in_flight_requests = {}
+in_flight_lock = threading.Lock()
+
+
+def run_single_flight(flight_key, run_request):
+    """Call run_request(), or wait for the result of an identical call already in flight."""
+    with in_flight_lock:
+        in_flight_future = in_flight_requests.get(flight_key)
+        is_leader = in_flight_future is None
+        if is_leader:
+            in_flight_future = Future()
+            in_flight_requests[flight_key] = in_flight_future
+    if not is_leader:
+        return in_flight_future.result()
+
+    try:
+        result = run_request()
+        in_flight_future.set_result(result)
+        return result
+    except BaseException as error:
+        in_flight_future.set_exception(error)
+        raise
+    finally:
+        with in_flight_lock:
+            del in_flight_requests[flight_key]
+
+
+def dig(json_value, *keys):
+    """Walk nested dictionaries by key, returning None as soon as a level is missing."""
+    for key in keys:
+        if not isinstance(json_value, dict):
+            return None
+        json_value = json_value.get(key)
+    return json_value
+
+
+def with_cache_status(result, cache_status):
+    """Tag a cached text result with how it was served."""
+    return dict(result, cache_status=cache_status) if result else result
+
+
+def conditional_request_headers(cached_entry):
+    """Build If-None-Match / If-Modified-Since headers from a cached entry's validators."""
+    request_headers = {}
+    if cached_entry is not None:
+        if cached_entry.etag:
+            request_headers['If-None-Match'] = cached_entry.etag
+        if cached_entry.last_modified:
+            request_headers['If-Modified-Since'] = cached_entry.last_modified
+    return request_headers
+
+
+def fetch_with_text_cache(text_cache, cache_key, fetch_text):
+    """Serve a text lookup from text_cache, calling fetch_text(*cache_key) on a miss or revalidating a stale entry."""
+    with text_cache_lock:
+        cached_entry = text_cache.get(cache_key)
+    if cached_entry is not None and time.monotonic() - cached_entry.fetched_at < TEXT_CACHE_TTL_SECONDS:
+        return with_cache_status(cached_entry.result, 'HIT')
+
+    def fetch_and_store_text():
+        # Runs only in the single-flight leader, so it revalidates the entry the leader read itself.
+        result, response_headers = fetch_text(*cache_key, request_headers=conditional_request_headers(cached_entry))
+        if result is NOT_MODIFIED and cached_entry is None:
+            # A 304 to a request sent without validators has nothing to refresh; fetch the text outright.
+            result, response_headers = fetch_text(*cache_key, request_headers={})
+        if result is NOT_MODIFIED:
+            with text_cache_lock:
+                text_cache[cache_key] = cached_entry._replace(fetched_at=time.monotonic())
+            return with_cache_status(cached_entry.result, 'REVALIDATED')
+
+        # Only cache definite answers; transient errors should be retried on the next request.
+        if result is None or result.get('status') == 'success':
+            with text_cache_lock:
+                text_cache[cache_key] = CachedText(
+                    result,
+                    response_headers.get('ETag'),
+                    response_headers.get('Last-Modified'),
+                    time.monotonic(),
+                )
+        return result
+
+    # Concurrent callers share the leader's result, so each gets its own copy to annotate.
+    result = run_single_flight((fetch_text, cache_key), fetch_and_store_text)
+    return dict(result) if result else result
+
 
 def fetch_wikipedia_text(article_title, max_text_length=2000):
-    """Fetch historical text from Wikipedia for a given article title."""
+    """Fetch historical text from Wikipedia for a given article title, using the text cache."""
+    return fetch_with_text_cache(wikipedia_text_cache, (article_title, max_text_length), request_wikipedia_text)
+
+
+def request_wikipedia_text(article_title, max_text_length=2000, request_headers=None):
+    """Request historical text from the Wikipedia API, returning the result and the response headers."""
     try:
         query_parameters = {
             'action': 'query',
             'format': 'json',
             'titles': article_title,
-            'prop': 'extracts|pageimages',
+            'prop': 'extracts',
             'exintro': 1,
+            'explaintext': 1,
             'redirects': 1,
         }
+        if max_text_length <= WIKI_EXCHARS_LIMIT:
+            query_parameters['exchars'] = max_text_length
         
-        response = requests.get(WIKI_API, params=query_parameters, timeout=10)
+        response = http_session.get(WIKI_API, params=query_parameters, headers=request_headers, timeout=10)
+        if response.status_code == 304:
+            return NOT_MODIFIED, response.headers
         response.raise_for_status()
         
-        response_data = response.json()
-        pages = response_data.get('query', {}).get('pages', {})
+        response_data = orjson.loads(response.content)
+        pages = dig(response_data, 'query', 'pages')
         if not pages:
-            return None
+            return None, response.headers
 
-        page = list(pages.values())[0]
+        page = next(iter(pages.values()))
         article_extract = page.get('extract', '')
         
         if not article_extract:
-            return None
+            return None, response.headers
 
-        article_extract = re.sub(r'<[^>]+>', '', article_extract)
         article_extract = article_extract[:max_text_length]
         page_id = page.get('pageid')
         wikipedia_url = f'https://en.wikipedia.org/?curid={page_id}' if page_id else None
@@ -56,14 +248,38 @@ def fetch_wikipedia_text(article_title, max_text_length=2000):
             'source': 'Wikipedia',
             'url': wikipedia_url,
             'status': 'success',
-        }
+        }, response.headers
     except Exception as error:
         print(f"Wikipedia API error: {error}")
-        return {'status': 'error', 'error': str(error)}
+        return {'status': 'error', 'error': str(error)}, {}
 
 
 def fetch_wikidata_text(wikidata_entity_id, max_text_length=2000):
-    """Fetch description and information from Wikidata for a given entity."""
+    """Fetch description and information from Wikidata for a given entity, using the text cache."""
+    return fetch_with_text_cache(wikidata_text_cache, (wikidata_entity_id, max_text_length), request_wikidata_text)
+
+
+def parse_wikidata_entity(wikidata_entity_id, entity, max_text_length=2000):
+    """Build a text result from a wbgetentities entity, or None if it has no English description."""
+    entity_description = dig(entity, 'descriptions', 'en', 'value')
+    
+    if not entity_description:
+        return None
+
+    entity_label = dig(entity, 'labels', 'en', 'value') or 'Unknown'
+    wikidata_url = f'https://www.wikidata.org/wiki/{wikidata_entity_id}'
+    combined_text = f"{entity_label}: {entity_description}"[:max_text_length]
+
+    return {
+        'text': combined_text,
+        'source': 'Wikidata',
+        'url': wikidata_url,
+        'status': 'success',
+    }
+
+
+def request_wikidata_text(wikidata_entity_id, max_text_length=2000, request_headers=None):
+    """Request description and information from the Wikidata API, returning the result and the response headers."""
     try:
         query_parameters = {
             'action': 'wbgetentities',
@@ -72,44 +288,115 @@ def fetch_wikidata_text(wikidata_entity_id, max_text_length=2000):
             'languages': 'en',
         }
         
-        response = requests.get(WIKIDATA_API, params=query_parameters, timeout=10)
+        response = http_session.get(WIKIDATA_API, params=query_parameters, headers=request_headers, timeout=10)
+        if response.status_code == 304:
+            return NOT_MODIFIED, response.headers
         response.raise_for_status()
         
-        response_data = response.json()
+        response_data = orjson.loads(response.content)
         entities = response_data.get('entities', {})
         if not entities:
-            return None
+            return None, response.headers
 
-        entity = list(entities.values())[0]
-        entity_description = entity.get('descriptions', {}).get('en', {}).get('value', '')
-        
-        if not entity_description:
-            return None
+        entity = next(iter(entities.values()))
+        return parse_wikidata_entity(wikidata_entity_id, entity, max_text_length), response.headers
+    except Exception as error:
+        print(f"Wikidata API error: {error}")
+        return {'status': 'error', 'error': str(error)}, {}
 
-        entity_label = entity.get('labels', {}).get('en', {}).get('value', 'Unknown')
-        wikidata_url = f'https://www.wikidata.org/wiki/{wikidata_entity_id}'
-        combined_text = f"{entity_label}: {entity_description}"[:max_text_length]
 
-        return {
-            'text': combined_text,
-            'source': 'Wikidata',
-            'url': wikidata_url,
-            'status': 'success',
+def request_wikidata_texts(wikidata_entity_ids, max_text_length=2000):
+    """Request several Wikidata entities in one wbgetentities call, returning a result per entity id."""
+    try:
+        query_parameters = {
+            'action': 'wbgetentities',
+            'ids': '|'.join(wikidata_entity_ids),
+            'format': 'json',
+            'languages': 'en',
+            'props': 'labels|descriptions',
         }
+        
+        response = http_session.get(WIKIDATA_API, params=query_parameters, timeout=10)
+        response.raise_for_status()
+        
+        response_data = orjson.loads(response.content)
+        # A single malformed id fails the whole call with HTTP 200 and a top-level error, so report it
+        # as an error for every id instead of letting it read as "no data" and be cached.
+        if 'error' in response_data:
+            raise ValueError(dig(response_data, 'error', 'info') or 'wbgetentities request failed')
+
+        # Wikidata returns entity keys normalized to upper case, whatever case the ids were sent in.
+        entities = response_data.get('entities', {})
+        batch_results = {}
+        for wikidata_entity_id in wikidata_entity_ids:
+            entity = entities.get(wikidata_entity_id.upper())
+            batch_results[wikidata_entity_id] = (
+                parse_wikidata_entity(wikidata_entity_id.upper(), entity, max_text_length) if entity else None
+            )
+        return batch_results
     except Exception as error:
         print(f"Wikidata API error: {error}")
-        return {'status': 'error', 'error': str(error)}
+        return {wikidata_entity_id: {'status': 'error', 'error': str(error)} for wikidata_entity_id in wikidata_entity_ids}
+
+
+def fetch_wikidata_texts_batch(wikidata_entity_ids, max_text_length=2000):
+    """Fetch Wikidata texts for several entities, requesting the uncached ones up to 50 per call."""
+    batch_results = {}
+    uncached_entity_ids = []
+    with text_cache_lock:
+        for wikidata_entity_id in dict.fromkeys(wikidata_entity_ids):
+            cached_entry = wikidata_text_cache.get((wikidata_entity_id, max_text_length))
+            if cached_entry is not None and time.monotonic() - cached_entry.fetched_at < TEXT_CACHE_TTL_SECONDS:
+                batch_results[wikidata_entity_id] = with_cache_status(cached_entry.result, 'HIT')
+            else:
+                uncached_entity_ids.append(wikidata_entity_id)
+
+    for batch_start in range(0, len(uncached_entity_ids), WIKIDATA_BATCH_SIZE):
+        fetched_results = request_wikidata_texts(
+            uncached_entity_ids[batch_start:batch_start + WIKIDATA_BATCH_SIZE],
+            max_text_length
+        )
+        # A combined response has no per-entity validators, so these entries are refetched once stale.
+        with text_cache_lock:
+            for wikidata_entity_id, result in fetched_results.items():
+                if result is None or result.get('status') == 'success':
+                    wikidata_text_cache[(wikidata_entity_id, max_text_length)] = CachedText(result, None, None, time.monotonic())
+        batch_results.update(fetched_results)
+    return batch_results
+
+
+def wikipedia_article_title(wikipedia_reference):
+    """Extract the article title from a Wikipedia URL or an OSM-style "lang:Title" tag."""
+    split_reference = urlsplit(wikipedia_reference)
+    if split_reference.netloc:
+        # Titles may contain slashes (e.g. /wiki/AC/DC), so keep everything after the /wiki/ prefix.
+        _, wiki_prefix, path_title = split_reference.path.partition('/wiki/')
+        query_title = parse_qs(split_reference.query).get('title')
+        if wiki_prefix and path_title:
+            article_title = unquote(path_title)
+        elif query_title:
+            article_title = query_title[0]
+        else:
+            article_title = unquote(split_reference.path.rsplit('/', 1)[-1])
+    else:
+        language_prefix, separator, tagged_title = wikipedia_reference.partition(':')
+        if separator and WIKI_LANGUAGE_PREFIX_PATTERN.fullmatch(language_prefix):
+            article_title = tagged_title
+        else:
+            article_title = wikipedia_reference
+    return article_title.replace('_', ' ')
 
 
 def retrieve_historical_text_from_multiple_sources(landmark_name, wikidata_entity_id=None, wikipedia_url=None):
     """Fetch historical text from multiple sources in order of preference."""
+    wikidata_future = None
+    if wikipedia_url and wikidata_entity_id:
+        # Start the Wikidata fallback now so its round trip overlaps the Wikipedia one.
+        wikidata_future = text_fetch_executor.submit(fetch_wikidata_text, wikidata_entity_id)
+
     if wikipedia_url:
         try:
-            if ':' in wikipedia_url:
-                article_title = wikipedia_url.split(':')[-1].replace('_', ' ')
-            else:
-                article_title = wikipedia_url.replace('_', ' ')
-            
+            article_title = wikipedia_article_title(wikipedia_url)
             result = fetch_wikipedia_text(article_title)
             if result and result.get('status') == 'success':
                 return result
@@ -117,7 +404,7 @@ def retrieve_historical_text_from_multiple_sources(landmark_name, wikidata_entit
             print(f"Error parsing Wikipedia URL: {error}")
 
     if wikidata_entity_id:
-        result = fetch_wikidata_text(wikidata_entity_id)
+        result = wikidata_future.result() if wikidata_future else fetch_wikidata_text(wikidata_entity_id)
         if result and result.get('status') == 'success':
             return result
 
@@ -137,13 +424,18 @@ def call_ollama_language_model(user_prompt, temperature=0.3):
         request_payload = {
             'model': OLLAMA_MODEL,
             'prompt': user_prompt,
-            'temperature': temperature,
             'stream': False,
+            'keep_alive': OLLAMA_KEEP_ALIVE,
+            'options': {
+                'temperature': temperature,
+                'num_ctx': OLLAMA_NUM_CTX,
+                'num_predict': OLLAMA_NUM_PREDICT,
+            },
         }
         
-        response = requests.post(OLLAMA_API, json=request_payload, timeout=60)
+        response = http_session.post(OLLAMA_API, json=request_payload, timeout=60)
         response.raise_for_status()
-        response_data = response.json()
+        response_data = orjson.loads(response.content)
         
         return {'answer': response_data.get('response', '').strip(), 'status': 'success'}
     except requests.exceptions.ConnectionError:
@@ -153,10 +445,118 @@ def call_ollama_language_model(user_prompt, temperature=0.3):
         return {'status': 'error', 'error': str(error)}
 
 
+def stream_ollama_language_model(user_prompt, temperature=0.3):
+    """Call the local Ollama LLM service and yield the response text as it is generated."""
+    request_payload = {
+        'model': OLLAMA_MODEL,
+        'prompt': user_prompt,
+        'stream': True,
+        'keep_alive': OLLAMA_KEEP_ALIVE,
+        'options': {
+            'temperature': temperature,
+            'num_ctx': OLLAMA_NUM_CTX,
+            'num_predict': OLLAMA_NUM_PREDICT,
+        },
+    }
+    
+    with http_session.post(OLLAMA_API, json=request_payload, stream=True, timeout=(5, 60)) as response:
+        response.raise_for_status()
+        for response_line in response.iter_lines():
+            if not response_line:
+                continue
+            response_chunk = orjson.loads(response_line)
+            if response_chunk.get('error'):
+                raise RuntimeError(response_chunk['error'])
+            if response_chunk.get('response'):
+                yield response_chunk['response']
+            if response_chunk.get('done'):
+                break
+
+
+def warm_up_ollama_model():
+    """Load the model and prefill the shared prompt prefix before the first real question."""
+    try:
+        http_session.post(OLLAMA_API, json={
+            'model': OLLAMA_MODEL,
+            'prompt': RAG_PROMPT_PREFIX,
+            'stream': False,
+            'keep_alive': OLLAMA_KEEP_ALIVE,
+            'options': {
+                'num_predict': 1,
+                'num_ctx': OLLAMA_NUM_CTX,
+            },
+        }, timeout=120)
+    except requests.exceptions.RequestException as error:
+        print(f"Ollama warm-up skipped: {error}")
+
+
+def format_server_sent_event(event_data):
+    """Encode a dictionary as a single Server-Sent Events message."""
+    return f"data: {orjson.dumps(event_data).decode()}\n\n"
+
+
+def record_generation_result(landmark_database_id, user_question, year_filter, generation_result, prompt_hash):
+    """Persist a generation attempt, caching the answer when it succeeded."""
+    if generation_result.get('status') == 'success':
+        db.save_generated_answer_for_landmark(
+            landmark_database_id, 
+            user_question, 
+            generation_result.get('answer'), 
+            year_filter, 
+            'success',
+            model_name=OLLAMA_MODEL_NAME,
+            wait=False
+        )
+        db.save_cached_answer(
+            prompt_hash,
+            landmark_database_id,
+            user_question,
+            generation_result.get('answer'),
+            model_name=OLLAMA_MODEL_NAME,
+            wait=False
+        )
+    else:
+        db.save_generated_answer_for_landmark(
+            landmark_database_id, 
+            user_question, 
+            year_filter=year_filter, 
+            generation_status='error', 
+            error_message=generation_result.get('error'),
+            model_name=OLLAMA_MODEL_NAME,
+            wait=False
+        )
+
+
+def stream_answer_generation(system_prompt, landmark_database_id, user_question, year_filter, prompt_hash):
+    """Yield Server-Sent Events for an answer, saving the assembled answer once the stream ends."""
+    answer_parts = []
+    generation_result = {'status': 'error', 'error': 'Stream interrupted'}
+    try:
+        for answer_token in stream_ollama_language_model(system_prompt, temperature=0.3):
+            answer_parts.append(answer_token)
+            yield format_server_sent_event({'token': answer_token})
+        
+        generation_result = {'status': 'success', 'answer': ''.join(answer_parts).strip()}
+        yield format_server_sent_event({
+            'done': True,
+            'status': 'success',
+            'answer': generation_result['answer'],
+            'source': 'Ollama LLM',
+            'cached': False,
+        })
+    except requests.exceptions.ConnectionError:
+        generation_result = {'status': 'error', 'error': 'Ollama not running. Try: ollama serve'}
+        yield format_server_sent_event({'done': True, **generation_result})
+    except Exception as error:
+        print(f"Ollama LLM streaming error: {error}")
+        generation_result = {'status': 'error', 'error': str(error)}
+        yield format_server_sent_event({'done': True, **generation_result})
+    finally:
+        record_generation_result(landmark_database_id, user_question, year_filter, generation_result, prompt_hash)
+
+
 def build_rag_system_prompt(landmark_name, landmark_metadata, historical_context, user_question, year_filter=None):
     """Build the RAG prompt for the LLM with system instructions, context, and question."""
-    system_instructions = "You are a historical expert. Answer ONLY from the provided context. Don't make stuff up. Keep it brief."
-    
     metadata_lines = []
     for metadata_key, metadata_value in landmark_metadata.items():
         metadata_lines.append(f"  {metadata_key}: {metadata_value}")
@@ -165,10 +565,7 @@ def build_rag_system_prompt(landmark_name, landmark_metadata, historical_context
     context_text = historical_context if historical_context else "[No context available]"
     year_hint = f"\nFocus on the year {year_filter}." if year_filter else ""
     
-    complete_prompt = f"""System Instructions:
-{system_instructions}
-
-LANDMARK: {landmark_name}
+    complete_prompt = RAG_PROMPT_PREFIX + f"""LANDMARK: {landmark_name}
 METADATA:
 {metadata_string}
 
@@ -181,21 +578,27 @@ ANSWER:"""
     
     return complete_prompt
 
+# Constant response bodies are serialized once, since health checks are polled constantly.
+HEALTH_RESPONSE_BODY = orjson.dumps({
+    'status': 'ok',
+    'service': 'History Platform API',
+    'version': '1.0'
+})
+NOT_FOUND_RESPONSE_BODY = orjson.dumps({'status': 'error', 'error': 'Not found'})
+SERVER_ERROR_RESPONSE_BODY = orjson.dumps({'status': 'error', 'error': 'Server error'})
+
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Simple health check endpoint to verify the server is running."""
-    return jsonify({
-        'status': 'ok',
-        'service': 'History Platform API',
-        'version': '1.0'
-    })
+    return Response(HEALTH_RESPONSE_BODY, mimetype='application/json')
 
 
 @app.route('/api/retrieve-text', methods=['POST'])
 def get_text():
     """Retrieve historical text for a landmark from various sources."""
     try:
-        data = request.get_json()
+        request_data = request.get_json()
         landmark_name = request_data.get('landmark_name', '')
         wikidata_entity_id = request_data.get('wikidata_id')
         wikipedia_url = request_data.get('wikipedia_url')
@@ -209,7 +612,7 @@ def get_text():
             wikipedia_url
         )
         
-        landmark_database_id = f"lm-{landmark_name.lower().replace(' ', '-')}"
+        landmark_database_id = landmark_slug(landmark_name)
         
         if retrieval_result.get('status') == 'success':
             db.save_historical_text_for_landmark(
@@ -217,16 +620,21 @@ def get_text():
                 retrieval_result.get('text'), 
                 retrieval_result.get('source'), 
                 retrieval_result.get('url'), 
-                'success'
+                'success',
+                wait=False
             )
         else:
             db.save_historical_text_for_landmark(
                 landmark_database_id, 
-                status='error', 
-                error_message=retrieval_result.get('error')
+                retrieval_status='error', 
+                error_message=retrieval_result.get('error'),
+                wait=False
             )
 
-        return jsonify(res)
+        cache_status = retrieval_result.pop('cache_status', 'MISS')
+        response = jsonify(retrieval_result)
+        response.headers['X-Cache'] = cache_status
+        return response
     except Exception as e:
         print(f"error in get_text: {e}")
         return jsonify({'status': 'error', 'error': str(e)}), 500
@@ -242,6 +650,7 @@ def handle_answer_generation_request():
         historical_text = request_data.get('historical_text')
         user_question = request_data.get('question', '')
         year_filter = request_data.get('year')
+        stream_requested = bool(request_data.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
 
         if not landmark_name or not user_question:
             return jsonify({'status': 'error', 'error': 'Missing landmark_name or question'}), 400
@@ -253,32 +662,45 @@ def handle_answer_generation_request():
             user_question, 
             year_filter
         )
+        landmark_database_id = landmark_slug(landmark_name)
+
+        prompt_hash = answer_cache_key(system_prompt)
+        cached_answer = db.retrieve_cached_answer(prompt_hash)
+        if cached_answer:
+            cached_response = {
+                'status': 'success',
+                'answer': cached_answer['answer'],
+                'error': None,
+                'source': 'Ollama LLM',
+                'cached': True,
+            }
+            if stream_requested:
+                return Response(format_server_sent_event({'done': True, **cached_response}), mimetype='text/event-stream')
+            return jsonify(cached_response)
         
-        generation_result = call_ollama_language_model(system_prompt, temperature=0.3)
-        landmark_database_id = f"lm-{landmark_name.lower().replace(' ', '-')}"
-        
-        if generation_result.get('status') == 'success':
-            db.save_generated_answer_for_landmark(
-                landmark_database_id, 
-                user_question, 
-                generation_result.get('answer'), 
-                year_filter, 
-                'success'
-            )
-        else:
-            db.save_generated_answer_for_landmark(
-                landmark_database_id, 
-                user_question, 
-                year_filter=year_filter, 
-                generation_status='error', 
-                error_message=generation_result.get('error')
+        if stream_requested:
+            return Response(
+                stream_with_context(stream_answer_generation(
+                    system_prompt, landmark_database_id, user_question, year_filter, prompt_hash
+                )),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
             )
+        
+        def generate_and_record_answer():
+            generation_result = call_ollama_language_model(system_prompt, temperature=0.3)
+            record_generation_result(landmark_database_id, user_question, year_filter, generation_result, prompt_hash)
+            return generation_result
+
+        # Identical questions arriving together share one generation and one saved answer.
+        generation_result = run_single_flight(('ollama', prompt_hash), generate_and_record_answer)
 
         return jsonify({
             'status': generation_result.get('status'),
             'answer': generation_result.get('answer'),
             'error': generation_result.get('error'),
             'source': 'Ollama LLM',
+            'cached': False,
         })
     except Exception as error:
         print(f"Error in handle_answer_generation_request: {error}")
@@ -289,26 +711,31 @@ def handle_answer_generation_request():
 def retrieve_platform_statistics():
     """Retrieve aggregate statistics about platform usage."""
     try:
-        database_connection = db.get_database_connection()
-        database_cursor = database_connection.cursor()
-        
-        database_cursor.execute('SELECT COUNT(*) FROM landmarks')
-        total_landmarks_count = database_cursor.fetchone()[0]
-        
-        database_cursor.execute('SELECT COUNT(*) FROM historical_texts')
-        total_texts_count = database_cursor.fetchone()[0]
-        
-        database_cursor.execute('SELECT COUNT(*) FROM generated_answers')
-        total_answers_count = database_cursor.fetchone()[0]
+        with statistics_cache_lock:
+            platform_statistics = statistics_cache.get('platform')
         
-        database_connection.close()
+        if platform_statistics is None:
+            database_connection = db.get_database_connection()
+            database_cursor = database_connection.cursor()
+            
+            database_cursor.execute('''
+                SELECT
+                    (SELECT COUNT(*) FROM landmarks),
+                    (SELECT COUNT(*) FROM historical_texts),
+                    (SELECT COUNT(*) FROM generated_answers)
+            ''')
+            total_landmarks_count, total_texts_count, total_answers_count = database_cursor.fetchone()
+            
+            platform_statistics = {
+                'status': 'success',
+                'total_landmarks': total_landmarks_count,
+                'total_texts': total_texts_count,
+                'total_answers': total_answers_count,
+            }
+            with statistics_cache_lock:
+                statistics_cache['platform'] = platform_statistics
         
-        return jsonify({
-            'status': 'success',
-            'total_landmarks': total_landmarks_count,
-            'total_texts': total_texts_count,
-            'total_answers': total_answers_count,
-        })
+        return jsonify(platform_statistics)
     except Exception as error:
         print(f"Error retrieving statistics: {error}")
         return jsonify({'status': 'error', 'error': str(error)}), 500
@@ -319,7 +746,7 @@ def retrieve_evaluation_results():
     """Retrieve evaluation test results from the database."""
     try:
         test_name = request.args.get('test_name')
-        evaluation_results = db.retrieve_evaluation_results(test_name)
+        evaluation_results = [dict(row) for row in db.retrieve_evaluation_results(test_name)]
         return jsonify({
             'status': 'success',
             'results': evaluation_results,
@@ -333,18 +760,23 @@ def retrieve_evaluation_results():
 @app.errorhandler(404)
 def handle_not_found_error(error):
     """Handle requests to non-existent endpoints."""
-    return jsonify({'status': 'error', 'error': 'Not found'}), 404
+    return Response(NOT_FOUND_RESPONSE_BODY, status=404, mimetype='application/json')
 
 
 @app.errorhandler(500)
 def handle_internal_server_error(error):
     """Handle internal server errors."""
-    return jsonify({'status': 'error', 'error': 'Server error'}), 500
+    return Response(SERVER_ERROR_RESPONSE_BODY, status=500, mimetype='application/json')
+
+
+# Warm the model in the background at import time, so this also runs under gunicorn.
+threading.Thread(target=warm_up_ollama_model, name='ollama-warm-up', daemon=True).start()
 
 
 if __name__ == '__main__':
     print("Starting backend...")
     print(f"Ollama API: {OLLAMA_API}")
     print(f"Model: {OLLAMA_MODEL}")
-    print("Make sure Ollama is running (ollama serve)")
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    print(f"Make sure Ollama is running (ollama serve) and the model is pulled (ollama pull {OLLAMA_MODEL})")
+    print("For concurrent requests run under gunicorn instead: gunicorn server:app")
+    app.run(debug=os.getenv('FLASK_ENV') == 'dev', host='0.0.0.0', port=5000)